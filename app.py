@@ -3,11 +3,20 @@ from flask import render_template
 from flask import request
 from flask import jsonify
 from flask import session
+from flask import Response
+from flask import stream_with_context
+from flask.json.provider import JSONProvider
 import os
-import uuid
 import secrets
 import sqlite3
-from datetime import datetime
+import queue
+import threading
+import atexit
+import hashlib
+import time
+import orjson
+from collections import OrderedDict
+from contextlib import contextmanager
 from dotenv import load_dotenv
 
 from core.langgraph_workflow import create_workflow
@@ -18,129 +27,535 @@ from tools.vector_store import get_or_create_vectorstore
 
 load_dotenv()
 
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson for faster jsonify()"""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 app.secret_key = secrets.token_hex(32)
 
+# Maximum number of in-memory conversation states kept before LRU eviction
+MAX_ACTIVE_CONVERSATIONS = 1024
+
+class ConversationStateCache:
+    """Bounded LRU mapping of session_id to conversation state"""
+    
+    def __init__(self, max_size=MAX_ACTIVE_CONVERSATIONS):
+        self.max_size = max_size
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __contains__(self, session_id):
+        with self._lock:
+            return session_id in self._states
+    
+    def __len__(self):
+        with self._lock:
+            return len(self._states)
+    
+    def __getitem__(self, session_id):
+        with self._lock:
+            self._states.move_to_end(session_id)
+            return self._states[session_id]
+    
+    def __setitem__(self, session_id, state):
+        with self._lock:
+            self._states[session_id] = state
+            self._states.move_to_end(session_id)
+            while len(self._states) > self.max_size:
+                self._states.popitem(last=False)
+    
+    def get(self, session_id, default=None):
+        """Return the state for session_id (marking it recently used) or default"""
+        with self._lock:
+            if session_id not in self._states:
+                return default
+            self._states.move_to_end(session_id)
+            return self._states[session_id]
+
+# State keys carried over from a workflow result into the stored conversation
+# state; everything else is reset per query, so large per-turn values such as
+# retrieved documents are not retained between turns
+HOT_KEYS = frozenset({
+    'question',
+    'generation',
+    'source',
+    'conversation_history',
+})
+
 # Global workflow and conversation states
 workflow_app = None
-conversation_states = {}
+conversation_states = ConversationStateCache()
 
 # SQLite Database Setup
-DB_PATH = './chat_db/medigenius_chats.db'
+DB_PATH = os.getenv('MEDIGENIUS_DB_PATH', './chat_db/medigenius_chats.db')
+
+# Connection-scoped PRAGMAs applied to every connection (journal_mode is persistent)
+DB_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-20000',
+    'PRAGMA mmap_size=268435456',
+    'PRAGMA busy_timeout=5000',
+    'PRAGMA foreign_keys=ON',
+)
+
+# Connection pool sizing
+DB_POOL_MIN_SIZE = 2
+DB_POOL_MAX_SIZE = 10
+
+# Seconds to wait for a free pooled connection before giving up
+DB_POOL_TIMEOUT = 30
+
+# Per-connection prepared statement cache size
+DB_CACHED_STATEMENTS = 256
+
+_db_pool = None
+_db_pool_lock = threading.Lock()
+
+# Background writer: chat messages are persisted off the request thread,
+# lingering briefly so concurrent writes share one commit
+DB_WRITE_LINGER = 0.005
+DB_WRITE_BATCH_SIZE = 256
+
+_write_q = queue.Queue()
+_db_writer = None
+_db_writer_lock = threading.Lock()
+
+# Seconds a reader waits for its session's queued writes before reading anyway
+DB_WRITE_WAIT_TIMEOUT = 10
+
+# Queued-but-uncommitted message count per session, so readers wait only for
+# their own session's writes
+_pending_writes = {}
+_pending_writes_cond = threading.Condition()
+
+# Hot-path SQL kept as module constants so the statement cache always hits
+UPSERT_SESSION_SQL = '''
+    INSERT INTO sessions (session_id) VALUES (?)
+    ON CONFLICT(session_id) DO UPDATE SET last_active = CURRENT_TIMESTAMP
+'''
+
+INSERT_MESSAGE_SQL = '''
+    INSERT INTO messages (session_id, role, content, source)
+    VALUES (?, ?, ?, ?)
+'''
+
+SELECT_HISTORY_SQL = '''
+    SELECT role, content, source, timestamp
+    FROM messages
+    WHERE session_id = ?
+    ORDER BY timestamp ASC
+'''
+
+def _connect():
+    """Open a SQLite connection with WAL mode and tuned PRAGMAs"""
+    conn = sqlite3.connect(
+        DB_PATH,
+        check_same_thread=False,
+        cached_statements=DB_CACHED_STATEMENTS
+    )
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    for pragma in DB_PRAGMAS:
+        cursor.execute(pragma)
+    return conn
+
+def _create_db_pool():
+    """Build a queue of long-lived SQLite connections"""
+    pool = queue.Queue(maxsize=DB_POOL_MAX_SIZE)
+    for _ in range(DB_POOL_MIN_SIZE):
+        pool.put(_connect())
+    for _ in range(DB_POOL_MAX_SIZE - DB_POOL_MIN_SIZE):
+        pool.put(None)  # Placeholder, connected lazily on first use
+    return pool
+
+def init_db_pool():
+    """Create the pool of long-lived SQLite connections"""
+    global _db_pool
+    
+    with _db_pool_lock:
+        _db_pool = _create_db_pool()
+
+def _get_db_pool():
+    """Return the connection pool, creating it once on first use"""
+    global _db_pool
+    
+    with _db_pool_lock:
+        if _db_pool is None:
+            _db_pool = _create_db_pool()
+        return _db_pool
+
+@contextmanager
+def get_conn():
+    """Borrow a pooled connection, replacing it if it breaks"""
+    pool = _get_db_pool()
+    try:
+        conn = pool.get(timeout=DB_POOL_TIMEOUT)
+    except queue.Empty:
+        raise sqlite3.OperationalError('Timed out waiting for a pooled connection')
+    
+    if conn is None:
+        try:
+            conn = _connect()
+        except BaseException:
+            pool.put(None)  # Give the slot back so the pool doesn't shrink
+            raise
+    
+    try:
+        yield conn
+    except sqlite3.Error:
+        # Errors from the caller's SQL (constraints, bindings) leave the
+        # connection usable; only discard it if it no longer responds
+        if not _connection_usable(conn):
+            conn.close()
+            conn = None
+        raise
+    finally:
+        try:
+            if conn is not None and conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            conn = None
+        finally:
+            pool.put(conn)
+
+def _connection_usable(conn):
+    """Roll back any open transaction and check the connection still responds"""
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+        conn.execute('SELECT 1')
+        return True
+    except sqlite3.Error:
+        return False
+
+def close_db_pool():
+    """Close idle pooled connections so forked workers open their own"""
+    global _db_pool
+    
+    flush_messages()
+    with _db_pool_lock:
+        pool, _db_pool = _db_pool, None
+    if pool is None:
+        return
+    
+    while True:
+        try:
+            conn = pool.get_nowait()
+        except queue.Empty:
+            break
+        if conn is not None:
+            conn.close()
+
+def _reset_after_fork():
+    """Give a forked child its own writer queue, locks and (lazy) writer thread"""
+    global _db_pool, _db_pool_lock, _write_q, _db_writer, _db_writer_lock
+    global _pending_writes, _pending_writes_cond
+    
+    # The parent's writer thread doesn't exist here, but its waiter is still
+    # registered on the inherited queue and would swallow the first put()
+    _db_pool = None
+    _db_pool_lock = threading.Lock()
+    _write_q = queue.Queue()
+    _db_writer = None
+    _db_writer_lock = threading.Lock()
+    _pending_writes = {}
+    _pending_writes_cond = threading.Condition()
+
+# SQLite connections and writer threads must not be shared across fork
+# (e.g. gunicorn --preload)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(before=close_db_pool, after_in_child=_reset_after_fork)
+
+# session_id is the clustered key, so sessions skip the rowid -> row indirection
+CREATE_SESSIONS_SQL = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        session_id TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_active TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (session_id)
+    ) WITHOUT ROWID
+'''
+
+CREATE_MESSAGES_SQL = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT NOT NULL,
+        role TEXT NOT NULL,
+        content TEXT NOT NULL,
+        source TEXT,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (session_id) REFERENCES sessions (session_id) ON DELETE CASCADE
+    )
+'''
+
+def _table_sql(cursor, table):
+    """Return the CREATE statement SQLite stored for a table"""
+    cursor.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    )
+    return cursor.fetchone()[0].upper()
+
+def _rebuild_table(cursor, table, create_sql, columns):
+    """Recreate a table from create_sql, copying its existing rows across"""
+    column_list = ', '.join(columns)
+    
+    # Foreign keys must be disabled outside a transaction while the table is rebuilt
+    cursor.execute('PRAGMA foreign_keys=OFF')
+    cursor.execute('BEGIN IMMEDIATE')
+    cursor.execute(create_sql.format(table=f'{table}_new'))
+    cursor.execute(
+        f'INSERT INTO {table}_new ({column_list}) SELECT {column_list} FROM {table}'
+    )
+    cursor.execute(f'DROP TABLE {table}')
+    cursor.execute(f'ALTER TABLE {table}_new RENAME TO {table}')
+    cursor.execute('COMMIT')
+    cursor.execute('PRAGMA foreign_keys=ON')
+
+def _migrate_schema(cursor):
+    """Rebuild tables created by older versions of the schema"""
+    if 'WITHOUT ROWID' not in _table_sql(cursor, 'sessions'):
+        print("Migrating sessions table to WITHOUT ROWID...")
+        _rebuild_table(
+            cursor, 'sessions', CREATE_SESSIONS_SQL,
+            ('session_id', 'created_at', 'last_active')
+        )
+    
+    if 'ON DELETE CASCADE' not in _table_sql(cursor, 'messages'):
+        print("Migrating messages table to ON DELETE CASCADE...")
+        _rebuild_table(
+            cursor, 'messages', CREATE_MESSAGES_SQL,
+            ('id', 'session_id', 'role', 'content', 'source', 'timestamp')
+        )
 
 def init_db():
     """Initialize SQLite database with required tables"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = _connect()
     cursor = conn.cursor()
     
     # Create sessions table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS sessions (
-            session_id TEXT PRIMARY KEY,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            last_active TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
+    cursor.execute(CREATE_SESSIONS_SQL.format(table='sessions'))
     
     # Create messages table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS messages (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            session_id TEXT NOT NULL,
-            role TEXT NOT NULL,
-            content TEXT NOT NULL,
-            source TEXT,
-            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (session_id) REFERENCES sessions (session_id)
-        )
-    ''')
+    cursor.execute(CREATE_MESSAGES_SQL.format(table='messages'))
     
-    conn.commit()
-    conn.close()
-
-def save_message(session_id, role, content, source=None):
-    """Save a message to the database"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    # Migrate databases created with an older schema
+    _migrate_schema(cursor)
     
-    # Ensure session exists
+    # Indexes for per-session first-message lookup, ordered history and
+    # most-recently-active session listing
     cursor.execute('''
-        INSERT OR IGNORE INTO sessions (session_id) VALUES (?)
-    ''', (session_id,))
-    
-    # Update last active time
+        CREATE INDEX IF NOT EXISTS idx_messages_session_role_ts
+        ON messages (session_id, role, timestamp)
+    ''')
     cursor.execute('''
-        UPDATE sessions SET last_active = CURRENT_TIMESTAMP WHERE session_id = ?
-    ''', (session_id,))
-    
-    # Insert message
+        CREATE INDEX IF NOT EXISTS idx_messages_session_ts
+        ON messages (session_id, timestamp)
+    ''')
     cursor.execute('''
-        INSERT INTO messages (session_id, role, content, source)
-        VALUES (?, ?, ?, ?)
-    ''', (session_id, role, content, source))
+        CREATE INDEX IF NOT EXISTS idx_sessions_last_active
+        ON sessions (last_active DESC)
+    ''')
     
     conn.commit()
     conn.close()
 
-def get_chat_history(session_id):
-    """Retrieve chat history for a session"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT role, content, source, timestamp
-        FROM messages
-        WHERE session_id = ?
-        ORDER BY timestamp ASC
-    ''', (session_id,))
-    
-    messages = []
-    for row in cursor.fetchall():
-        messages.append({
-            'role': row[0],
-            'content': row[1],
-            'source': row[2],
-            'timestamp': row[3]
-        })
+def _write_messages(batch):
+    """Persist a batch of queued messages in a single transaction"""
+    # Each session is upserted once, before any of its messages
+    session_ids = dict.fromkeys(message[0] for message in batch)
+    
+    with get_conn() as conn:
+        cursor = conn.cursor()
+        
+        # Single transaction: one commit for the whole batch
+        cursor.execute('BEGIN IMMEDIATE')
+        
+        # Ensure sessions exist and update last active time
+        cursor.executemany(UPSERT_SESSION_SQL, ((sid,) for sid in session_ids))
+        
+        # Insert messages in arrival order
+        cursor.executemany(INSERT_MESSAGE_SQL, batch)
+        
+        conn.commit()
+
+def _write_messages_one_by_one(batch):
+    """Persist each message in its own transaction, dropping only failing rows"""
+    for message in batch:
+        try:
+            _write_messages([message])
+        except sqlite3.Error as e:
+            app.logger.error(
+                "Dropped message for session %r: %s", message[0], e
+            )
+
+def _db_writer_loop():
+    """Drain the write queue, coalescing writes that arrive within the linger window"""
+    while True:
+        batch = [_write_q.get()]
+        deadline = time.monotonic() + DB_WRITE_LINGER
+        try:
+            while len(batch) < DB_WRITE_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                batch.append(_write_q.get(timeout=remaining))
+        except queue.Empty:
+            pass
+        
+        try:
+            try:
+                _write_messages(batch)
+            except sqlite3.Error as e:
+                # Retry row by row so one bad message doesn't lose the batch
+                app.logger.warning(
+                    "Batch of %d message(s) failed (%s); retrying individually",
+                    len(batch), e
+                )
+                _write_messages_one_by_one(batch)
+        finally:
+            _mark_written(batch)
+            for _ in batch:
+                _write_q.task_done()
+
+def _mark_written(batch):
+    """Release readers waiting on the sessions in a processed batch"""
+    with _pending_writes_cond:
+        for message in batch:
+            session_id = message[0]
+            remaining = _pending_writes[session_id] - 1
+            if remaining:
+                _pending_writes[session_id] = remaining
+            else:
+                del _pending_writes[session_id]
+        _pending_writes_cond.notify_all()
+
+def start_db_writer():
+    """Start the background thread that persists chat messages"""
+    global _db_writer
+    
+    with _db_writer_lock:
+        if _db_writer is None or not _db_writer.is_alive():
+            _db_writer = threading.Thread(
+                target=_db_writer_loop,
+                name='medigenius-db-writer',
+                daemon=True
+            )
+            _db_writer.start()
+
+def flush_messages():
+    """Block until every queued message has been committed"""
+    if _db_writer is not None and _db_writer.is_alive():
+        _write_q.join()
+
+def wait_for_session_writes(session_id):
+    """Block until the messages queued for one session have been committed"""
+    with _pending_writes_cond:
+        written = _pending_writes_cond.wait_for(
+            lambda: session_id not in _pending_writes,
+            timeout=DB_WRITE_WAIT_TIMEOUT
+        )
     
-    conn.close()
-    return messages
+    if not written:
+        app.logger.warning(
+            "Timed out waiting for queued writes of session %r", session_id
+        )
+    return written
+
+atexit.register(flush_messages)
+
+def save_message(session_id, role, content, source=None):
+    """Queue a message to be saved to the database by the background writer"""
+    start_db_writer()
+    with _pending_writes_cond:
+        _pending_writes[session_id] = _pending_writes.get(session_id, 0) + 1
+    _write_q.put((session_id, role, content, source))
+
+def stream_chat_history(session_id, fields):
+    """Yield a session's history as JSON chunks, one message row at a time"""
+    wait_for_session_writes(session_id)  # Read-your-writes for queued messages
+    with get_conn() as conn:
+        cursor = conn.cursor()
+        cursor.execute(SELECT_HISTORY_SQL, (session_id,))
+        
+        yield b'{"messages":['
+        separator = b''
+        for row in cursor:
+            yield separator + orjson.dumps(dict(row))
+            separator = b','
+    
+    # Close the array and append the remaining top-level fields
+    yield b'],' + orjson.dumps(fields)[1:]
+
+def get_history_etag(session_id):
+    """ETag for a session's history, changing whenever a message is added"""
+    wait_for_session_writes(session_id)  # Read-your-writes for queued messages
+    with get_conn() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT MAX(id), COUNT(*) FROM messages WHERE session_id = ?
+        ''', (session_id,))
+        version = tuple(cursor.fetchone())
+    
+    return _make_etag(session_id, *version)
+
+def get_sessions_etag(session_id=None):
+    """ETag for the session list, changing on new messages and deletions"""
+    wait_for_session_writes(session_id)  # Read-your-writes for the requester
+    with get_conn() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT COUNT(*), MAX(last_active), (SELECT MAX(id) FROM messages)
+            FROM sessions
+        ''')
+        version = tuple(cursor.fetchone())
+    
+    return _make_etag(*version)
 
-def get_all_sessions():
+def _make_etag(*parts):
+    """Hash version parts into a short ETag value"""
+    return hashlib.blake2b(repr(parts).encode(), digest_size=8).hexdigest()
+
+def get_all_sessions(session_id=None):
     """Get all chat sessions"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT s.session_id, s.created_at, s.last_active, 
-               (SELECT content FROM messages WHERE session_id = s.session_id 
-                AND role = 'user' ORDER BY timestamp ASC LIMIT 1) as first_message
-        FROM sessions s
-        ORDER BY s.last_active DESC
-    ''')
-    
-    sessions = []
-    for row in cursor.fetchall():
-        sessions.append({
-            'session_id': row[0],
-            'created_at': row[1],
-            'last_active': row[2],
-            'preview': row[3][:50] + '...' if row[3] and len(row[3]) > 50 else row[3]
-        })
+    wait_for_session_writes(session_id)  # Read-your-writes for the requester
+    with get_conn() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT s.session_id, s.created_at, s.last_active, 
+                   (SELECT content FROM messages WHERE session_id = s.session_id 
+                    AND role = 'user' ORDER BY timestamp ASC, id ASC LIMIT 1) as preview
+            FROM sessions s
+            ORDER BY s.last_active DESC
+        ''')
+        
+        sessions = [dict(row) for row in cursor]
+    
+    # Truncate the first user message into a short preview
+    for chat_session in sessions:
+        preview = chat_session['preview']
+        if preview and len(preview) > 50:
+            chat_session['preview'] = preview[:50] + '...'
     
-    conn.close()
     return sessions
 
 def delete_session(session_id):
     """Delete a chat session and its messages"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('DELETE FROM messages WHERE session_id = ?', (session_id,))
-    cursor.execute('DELETE FROM sessions WHERE session_id = ?', (session_id,))
-    
-    conn.commit()
-    conn.close()
+    wait_for_session_writes(session_id)  # Don't let a queued write resurrect it
+    with get_conn() as conn:
+        # Messages are removed by ON DELETE CASCADE in the same transaction
+        with conn:
+            conn.execute('DELETE FROM sessions WHERE session_id = ?', (session_id,))
 
 def initialize_system():
     global workflow_app
@@ -165,12 +580,16 @@ def initialize_system():
         print("No vector database and no PDF found - RAG features will be limited")
     
     workflow_app = create_workflow()
+    
+    # Warm up the database connection pool and start the message writer
+    init_db_pool()
+    start_db_writer()
     print("MediGenius Web Interface Ready!")
 
 @app.route('/')
 def index():
     if 'session_id' not in session:
-        session['session_id'] = str(uuid.uuid4())
+        session['session_id'] = secrets.token_hex(16)
     return render_template('index.html')
 
 @app.route('/api/chat', methods=['POST'])
@@ -181,29 +600,36 @@ def chat():
     message = data.get('message', '')
     session_id = session.get('session_id')
     
+    if not session_id:
+        return jsonify({'error': 'No active session'}), 400
+    
     if not message:
         return jsonify({'error': 'No message provided'}), 400
     
-    if not workflow_app:
-        return jsonify({'error': 'System not initialized'}), 500
+    if not isinstance(message, str):
+        return jsonify({'error': 'Message must be a string'}), 400
     
     # Save user message to database
     save_message(session_id, 'user', message)
     
     # Initialize or get conversation state
-    if session_id not in conversation_states:
-        conversation_states[session_id] = initialize_conversation_state()
+    conversation_state = conversation_states.get(session_id)
+    if conversation_state is None:
+        conversation_state = initialize_conversation_state()
+        conversation_states[session_id] = conversation_state
     
-    conversation_state = conversation_states[session_id]
-    conversation_state = reset_query_state(conversation_state)
+    reset_query_state(conversation_state)
     conversation_state["question"] = message
     
-    # Process query through workflow
+    # Process query through workflow, keeping only the hot keys in place
     result = workflow_app.invoke(conversation_state)
-    conversation_states[session_id].update(result)
+    for key in HOT_KEYS:
+        value = result.get(key)
+        if value is not None:
+            conversation_state[key] = value
     
     # Get current timestamp
-    timestamp = datetime.now().strftime("%I:%M %p")
+    timestamp = time.strftime("%I:%M %p")
     
     # Extract response and source
     response = result.get('generation', 'Unable to generate response.')
@@ -219,6 +645,18 @@ def chat():
         'success': bool(result.get('generation'))
     })
 
+def conditional_response(etag, build_response):
+    """Answer 304 if the client's ETag matches, otherwise build the full response"""
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = build_response()
+    
+    # Make browsers revalidate on every poll instead of reusing a stale body
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 @app.route('/api/history', methods=['GET'])
 def get_history():
     """Get chat history for current session"""
@@ -226,25 +664,36 @@ def get_history():
     if not session_id:
         return jsonify({'messages': []})
     
-    messages = get_chat_history(session_id)
-    return jsonify({'messages': messages, 'success': True})
+    return conditional_response(
+        get_history_etag(session_id),
+        lambda: Response(
+            stream_with_context(stream_chat_history(session_id, {'success': True})),
+            mimetype='application/json'
+        )
+    )
 
 @app.route('/api/sessions', methods=['GET'])
 def get_sessions():
     """Get all chat sessions"""
-    sessions = get_all_sessions()
-    return jsonify({'sessions': sessions, 'success': True})
+    session_id = session.get('session_id')
+    return conditional_response(
+        get_sessions_etag(session_id),
+        lambda: jsonify({'sessions': get_all_sessions(session_id), 'success': True})
+    )
 
 @app.route('/api/session/<session_id>', methods=['GET'])
 def load_session(session_id):
     """Load a specific chat session"""
     session['session_id'] = session_id
-    messages = get_chat_history(session_id)
-    return jsonify({
-        'messages': messages,
-        'session_id': session_id,
-        'success': True
-    })
+    return Response(
+        stream_with_context(
+            stream_chat_history(session_id, {
+                'session_id': session_id,
+                'success': True
+            })
+        ),
+        mimetype='application/json'
+    )
 
 @app.route('/api/session/<session_id>', methods=['DELETE'])
 def delete_chat_session(session_id):
@@ -253,7 +702,7 @@ def delete_chat_session(session_id):
     
     # If current session was deleted, create new one
     if session.get('session_id') == session_id:
-        session['session_id'] = str(uuid.uuid4())
+        session['session_id'] = secrets.token_hex(16)
     
     return jsonify({'message': 'Session deleted', 'success': True})
 
@@ -268,7 +717,7 @@ def clear():
 @app.route('/api/new-chat', methods=['POST'])
 def new_chat():
     """Create a new chat session"""
-    new_session_id = str(uuid.uuid4())
+    new_session_id = secrets.token_hex(16)
     session['session_id'] = new_session_id
     return jsonify({
         'message': 'New chat created',
@@ -280,6 +729,10 @@ def new_chat():
 def health():
     return jsonify({'status': 'healthy', 'service': 'MediGenius'})
 
+# Initialize on import so WSGI servers (e.g. gunicorn --preload) serve a ready app
+initialize_system()
+
 if __name__ == '__main__':
-    initialize_system()
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    # Development server only; in production run under gunicorn, e.g.
+    #   gunicorn -w 1 -k gthread --threads 8 --preload -b 0.0.0.0:5000 app:app
+    app.run(debug=os.getenv('FLASK_DEBUG') == '1', host='0.0.0.0', port=5000)
\ No newline at end of file
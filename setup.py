@@ -33,6 +33,7 @@ setup(
         'passlib',
         'gunicorn',
         'flask',
+        'orjson',
         'pytest'
     ],
     python_requires='>=3.9',
@@ -0,0 +1,34 @@
+import os
+import sys
+import types
+import tempfile
+
+import pytest
+
+# Keep the tracked chat database untouched: importing app initializes the DB
+os.environ['MEDIGENIUS_DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'import.db')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Stub the workflow and vector store so importing app doesn't load models
+_STUBS = {
+    'core.langgraph_workflow': {'create_workflow': lambda: None},
+    'tools.pdf_loader': {'process_pdf': lambda pdf_path: []},
+    'tools.vector_store': {'get_or_create_vectorstore': lambda **kwargs: True},
+}
+for name, attrs in _STUBS.items():
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    sys.modules[name] = module
+
+import app as app_module  # noqa: E402
+
+
+@pytest.fixture
+def medigenius(tmp_path, monkeypatch):
+    """The app module pointed at a fresh database for one test"""
+    app_module.close_db_pool()
+    monkeypatch.setattr(app_module, 'DB_PATH', str(tmp_path / 'chats.db'))
+    app_module.init_db()
+    yield app_module
+    app_module.close_db_pool()
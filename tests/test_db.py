@@ -0,0 +1,153 @@
+import sqlite3
+import threading
+
+import pytest
+
+# Schema written by releases before the WITHOUT ROWID / ON DELETE CASCADE changes
+LEGACY_SCHEMA = '''
+    CREATE TABLE sessions (
+        session_id TEXT PRIMARY KEY,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_active TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT NOT NULL,
+        role TEXT NOT NULL,
+        content TEXT NOT NULL,
+        source TEXT,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (session_id) REFERENCES sessions (session_id)
+    );
+'''
+
+LEGACY_SESSIONS = [
+    ('session-a', '2025-10-05 18:07:25', '2025-10-05 18:44:57'),
+    ('session-b', '2025-10-06 13:23:01', '2025-10-06 13:23:41'),
+]
+
+LEGACY_MESSAGES = [
+    (3, 'session-a', 'user', 'What are diabetes symptoms?', None, '2025-10-05 18:07:25'),
+    (7, 'session-a', 'assistant', 'Common symptoms include...', 'LLM', '2025-10-05 18:07:30'),
+    (12, 'session-b', 'user', 'i feel some acne on my face', None, '2025-10-06 13:23:01'),
+]
+
+
+def _create_legacy_db(path):
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.executemany('INSERT INTO sessions VALUES (?, ?, ?)', LEGACY_SESSIONS)
+    conn.executemany('INSERT INTO messages VALUES (?, ?, ?, ?, ?, ?)', LEGACY_MESSAGES)
+    conn.commit()
+    conn.close()
+
+
+def _table_sql(conn, table):
+    return conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone()[0].upper()
+
+
+def test_init_db_migrates_legacy_schema(medigenius, tmp_path, monkeypatch):
+    db_path = str(tmp_path / 'legacy.db')
+    _create_legacy_db(db_path)
+    monkeypatch.setattr(medigenius, 'DB_PATH', db_path)
+    
+    medigenius.init_db()
+    
+    conn = sqlite3.connect(db_path)
+    assert 'WITHOUT ROWID' in _table_sql(conn, 'sessions')
+    assert 'ON DELETE CASCADE' in _table_sql(conn, 'messages')
+    assert conn.execute(
+        'SELECT * FROM sessions ORDER BY session_id'
+    ).fetchall() == LEGACY_SESSIONS
+    assert conn.execute('SELECT * FROM messages ORDER BY id').fetchall() == LEGACY_MESSAGES
+    assert conn.execute('PRAGMA foreign_key_check').fetchall() == []
+    conn.close()
+
+
+def test_init_db_migration_is_idempotent(medigenius, tmp_path, monkeypatch):
+    db_path = str(tmp_path / 'legacy.db')
+    _create_legacy_db(db_path)
+    monkeypatch.setattr(medigenius, 'DB_PATH', db_path)
+    
+    medigenius.init_db()
+    medigenius.init_db()
+    
+    conn = sqlite3.connect(db_path)
+    assert conn.execute('SELECT COUNT(*) FROM messages').fetchone()[0] == len(LEGACY_MESSAGES)
+    conn.close()
+
+
+def test_delete_session_cascades_after_migration(medigenius, tmp_path, monkeypatch):
+    db_path = str(tmp_path / 'legacy.db')
+    _create_legacy_db(db_path)
+    monkeypatch.setattr(medigenius, 'DB_PATH', db_path)
+    medigenius.init_db()
+    
+    medigenius.delete_session('session-a')
+    
+    conn = sqlite3.connect(db_path)
+    assert conn.execute('SELECT session_id FROM sessions').fetchall() == [('session-b',)]
+    assert conn.execute('SELECT session_id FROM messages').fetchall() == [('session-b',)]
+    conn.close()
+
+
+def test_get_conn_returns_slot_when_connect_fails(medigenius, monkeypatch):
+    medigenius.close_db_pool()
+    medigenius.init_db_pool()
+    pool = medigenius._db_pool
+    
+    # Only placeholder slots connect lazily, so make every slot one
+    while not pool.empty():
+        conn = pool.get_nowait()
+        if conn is not None:
+            conn.close()
+    for _ in range(medigenius.DB_POOL_MAX_SIZE):
+        pool.put(None)
+    
+    def failing_connect():
+        raise sqlite3.OperationalError('unable to open database file')
+    
+    monkeypatch.setattr(medigenius, '_connect', failing_connect)
+    for _ in range(medigenius.DB_POOL_MAX_SIZE):
+        with pytest.raises(sqlite3.OperationalError):
+            with medigenius.get_conn():
+                pass
+    
+    assert pool.qsize() == medigenius.DB_POOL_MAX_SIZE
+
+
+def test_get_conn_times_out_when_pool_is_exhausted(medigenius, monkeypatch):
+    monkeypatch.setattr(medigenius, 'DB_POOL_TIMEOUT', 0.01)
+    medigenius.close_db_pool()
+    medigenius.init_db_pool()
+    pool = medigenius._db_pool
+    borrowed = [pool.get_nowait() for _ in range(medigenius.DB_POOL_MAX_SIZE)]
+    
+    with pytest.raises(sqlite3.OperationalError):
+        with medigenius.get_conn():
+            pass
+    
+    for conn in borrowed:
+        pool.put(conn)
+
+
+def test_concurrent_first_use_builds_one_pool(medigenius):
+    medigenius.close_db_pool()
+    barrier = threading.Barrier(8)
+    pools = []
+    
+    def borrow():
+        barrier.wait()
+        with medigenius.get_conn():
+            pools.append(medigenius._db_pool)
+    
+    threads = [threading.Thread(target=borrow) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert len({id(pool) for pool in pools}) == 1
+    assert medigenius._db_pool.qsize() == medigenius.DB_POOL_MAX_SIZE